@@ -4,6 +4,10 @@ from tango import AttrWriteType
 from tango.server import Device, attribute, command, run
 
 
+# polling period of the attributes in milliseconds, clients read them from the polling cache
+POLLING_PERIOD = 500
+
+
 class PaintTank(Device):
     """
     Tango device server implementation representing a single paint tank
@@ -19,28 +23,36 @@ class PaintTank(Device):
         if not self.tank:
             raise Exception(
                 "Error: Can't find matching paint tank in the simulator with given name = %s" % self.get_name())
+        self.snapshot = self.tank.snapshot()
+
+    def read_attr_hardware(self, attr_list):
+        """
+        called once before the attributes of a read request are read,
+        takes a single snapshot of the simulated tank for the requested attributes
+        """
+        names = [self.get_device_attr().get_attr_by_ind(ind).get_name() for ind in attr_list]
+        self.snapshot = self.tank.snapshot(names)
 
-    @attribute(dtype=float)
+    @attribute(dtype=float, polling_period=POLLING_PERIOD)
     def level(self):
         """
         get level attribute
         range: 0 to 1
         """
-        # TODO: return level of simulated tank
-        return self.tank.get_level()
+        return self.snapshot['level']
 
-    @attribute(dtype=float)
+    @attribute(dtype=float, polling_period=POLLING_PERIOD)
     def flow(self):
         """
         get flow attribute
         """
-        # TODO: return flow of simulated tank
-        return self.tank.get_outflow()
+        return self.snapshot['flow']
 
     valve = attribute(label="valve", dtype=float,
                       access=AttrWriteType.READ_WRITE,
                       min_value=0.0, max_value=1.0,
-                      fget="get_valve", fset="set_valve")
+                      fget="get_valve", fset="set_valve",
+                      polling_period=POLLING_PERIOD)
 
     def set_valve(self, ratio):
         """
@@ -54,16 +66,14 @@ class PaintTank(Device):
         """
         get valve attribute (range: 0 to 1)
         """
-        # TODO: get valve of simulated tank
-        return self.tank.valve_ratio
+        return self.snapshot['valve']
 
-    @attribute(dtype=str)
+    @attribute(dtype=str, polling_period=POLLING_PERIOD)
     def color(self):
         """
         get color attribute (hex string)
         """
-        # TODO: get color of simulated tank
-        return self.tank.get_color_rgb()
+        return self.snapshot['color']
 
     @command(dtype_out=float)
     def Fill(self):
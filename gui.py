@@ -1,13 +1,20 @@
 import sys
 import time
 import signal
+import logging
+from collections import deque
+from functools import partial
+from threading import Event, Lock
+from queue import Queue
 
 import numpy as np
 
 from PyQt5.QtWidgets import QApplication, QWidget, QSlider, QHBoxLayout, QVBoxLayout, QLabel, QMainWindow, QPushButton, QStackedLayout, QFrame
-from PyQt5.QtCore import Qt, QThread, QRunnable, pyqtSlot, QThreadPool, QObject, pyqtSignal, QRect
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QRect, QTimer
 from PyQt5.QtGui import QPainter, QColor, QPen
-from tango import AttributeProxy, DeviceProxy
+from tango import Group, DevSource, AsynReplyNotArrived
+
+log = logging.getLogger(__name__)
 
 # prefix for all Tango device names
 TANGO_NAME_PREFIX = "epfl"
@@ -20,6 +27,31 @@ TANGO_ATTRIBUTE_COLOR = "color"
 TANGO_COMMAND_FILL = "Fill"
 TANGO_COMMAND_FLUSH = "Flush"
 
+# tank devices of a paint mixing station by name, with the settings of their tank widgets
+TANK_SPECS = {"cyan": dict(width=150, fill_button=True),
+              "magenta": dict(width=150, fill_button=True),
+              "yellow": dict(width=150, fill_button=True),
+              "black": dict(width=150, fill_button=True),
+              "white": dict(width=150, fill_button=True),
+              "mixer": dict(width=860, flush_button=True)}
+TANK_NAMES = list(TANK_SPECS)
+
+
+def get_device_names(station_name):
+    """
+    get the full Tango device names of the tanks of the given station by tank name
+    """
+    return {tank_name: f"{TANGO_NAME_PREFIX}/{station_name}/{tank_name}" for tank_name in TANK_NAMES}
+
+
+# QColor instances by hex string, shared by all tank widgets
+QCOLOR_CACHE = {}
+
+# style sheets of the tank level labels in the station overview
+LABEL_STYLE_NONE = "background-color: none"
+LABEL_STYLE_WARNING = "background-color: rgba(255, 165, 0, 1)"  # orange
+LABEL_STYLE_ALARM = "background-color: rgba(255, 0, 0, 1)"  # red
+
 
 class TankWidget(QWidget):
     """
@@ -31,12 +63,40 @@ class TankWidget(QWidget):
     def __init__(self, tank_width, tank_height=200, level=0):
         super().__init__()
         self.fill_color = QColor("grey")
+        self.color = None
         self.fill_level = level
         self.tank_height = tank_height
         self.tank_width = tank_width
         self.valve = 0
         self.flow = 0
         self.setMinimumSize(self.tank_width, self.tank_height + self.MARGIN_BOTTOM)
+        # pens used in paintEvent
+        self.pen_outline = QPen(Qt.black, 2, Qt.SolidLine)
+        self.pen_paint = QPen(QColor(0, 0, 0, 0))
+        self.computeGeometry()
+
+    def computeGeometry(self):
+        """
+        pre-compute the geometry used to draw the UI elements from the current widget size
+        """
+        self.w = self.width()
+        self.h = self.height()
+        # horizontal center of the valve symbol
+        self.cx = self.w // 2
+        # vertical position of the tank bottom
+        self.bottom = self.h - self.MARGIN_BOTTOM
+        # height of the tank interior
+        self.inner_height = self.bottom - 4
+        # areas of the valve and flow labels, left and right of the valve symbol
+        self.rect_valve_label = QRect(0, self.bottom, self.cx - self.VALVE_WIDTH, self.MARGIN_BOTTOM)
+        self.rect_flow_label = QRect(self.cx + self.VALVE_WIDTH, self.bottom, self.cx - self.VALVE_WIDTH,
+                                     self.MARGIN_BOTTOM)
+
+    def resizeEvent(self, event):
+        """
+        callback when the widget has been resized
+        """
+        self.computeGeometry()
 
     def setValve(self, valve):
         """
@@ -54,73 +114,71 @@ class TankWidget(QWidget):
         """
         set the color of the paint in hex format (e.g. #000000)
         """
-        self.fill_color = QColor(color)
+        if color == self.color:
+            return
+        self.color = color
+        if color not in QCOLOR_CACHE:
+            QCOLOR_CACHE[color] = QColor(color)
+        self.fill_color = QCOLOR_CACHE[color]
 
     def paintEvent(self, event):
         """
         paint method called to draw the UI elements
         """
+        w, h, cx, bottom = self.w, self.h, self.cx, self.bottom
         # get a painter object
         painter = QPainter(self)
         # draw tank outline as solid black line
-        painter.setPen(QPen(Qt.black, 2, Qt.SolidLine))
-        painter.drawRect(1, 1, self.width() - 2, self.height() - self.MARGIN_BOTTOM - 2)
+        painter.setPen(self.pen_outline)
+        painter.drawRect(1, 1, w - 2, bottom - 2)
         # draw paint color
-        painter.setPen(QColor(0, 0, 0, 0))
+        painter.setPen(self.pen_paint)
         painter.setBrush(self.fill_color)
-        painter.drawRect(2, 2 + int((1.0 - self.fill_level) * (self.height() - self.MARGIN_BOTTOM - 4)),
-                         self.width() - 4,
-                         int(self.fill_level * (self.height() - self.MARGIN_BOTTOM - 4)))
+        painter.drawRect(2, 2 + int((1.0 - self.fill_level) * self.inner_height),
+                         w - 4,
+                         int(self.fill_level * self.inner_height))
         # draw valve symobl
-        painter.setPen(QPen(Qt.black, 2, Qt.SolidLine))
-        painter.drawLine(self.width() // 2, self.height() - self.MARGIN_BOTTOM, self.width() // 2,
-                         self.height() - self.MARGIN_BOTTOM + 5)
-        painter.drawLine(self.width() // 2, self.height(), self.width() // 2,
-                         self.height() - 5)
-        painter.drawLine(self.width() // 2 - self.VALVE_WIDTH, self.height() - self.MARGIN_BOTTOM + 5,
-                         self.width() // 2 + self.VALVE_WIDTH,
-                         self.height() - 5)
-        painter.drawLine(self.width() // 2 - self.VALVE_WIDTH, self.height() - 5, self.width() // 2 + self.VALVE_WIDTH,
-                         self.height() - self.MARGIN_BOTTOM + 5)
-        painter.drawLine(self.width() // 2 - self.VALVE_WIDTH, self.height() - self.MARGIN_BOTTOM + 5,
-                         self.width() // 2 + self.VALVE_WIDTH,
-                         self.height() - self.MARGIN_BOTTOM + 5)
-        painter.drawLine(self.width() // 2 - self.VALVE_WIDTH, self.height() - 5, self.width() // 2 + self.VALVE_WIDTH,
-                         self.height() - 5)
+        painter.setPen(self.pen_outline)
+        painter.drawLine(cx, bottom, cx, bottom + 5)
+        painter.drawLine(cx, h, cx, h - 5)
+        painter.drawLine(cx - self.VALVE_WIDTH, bottom + 5, cx + self.VALVE_WIDTH, h - 5)
+        painter.drawLine(cx - self.VALVE_WIDTH, h - 5, cx + self.VALVE_WIDTH, bottom + 5)
+        painter.drawLine(cx - self.VALVE_WIDTH, bottom + 5, cx + self.VALVE_WIDTH, bottom + 5)
+        painter.drawLine(cx - self.VALVE_WIDTH, h - 5, cx + self.VALVE_WIDTH, h - 5)
         # draw labels
-        painter.drawText(
-            QRect(0, self.height() - self.MARGIN_BOTTOM, self.width() // 2 - self.VALVE_WIDTH, self.MARGIN_BOTTOM),
-            Qt.AlignCenter, "%u%%" % self.valve)
-        painter.drawText(
-            QRect(self.width() // 2 + self.VALVE_WIDTH, self.height() - self.MARGIN_BOTTOM,
-                  self.width() // 2 - self.VALVE_WIDTH, self.MARGIN_BOTTOM),
-            Qt.AlignCenter, "%.1f l/s" % self.flow)
+        painter.drawText(self.rect_valve_label, Qt.AlignCenter, "%u%%" % self.valve)
+        painter.drawText(self.rect_flow_label, Qt.AlignCenter, "%.1f l/s" % self.flow)
 
 
 class PaintTankWidget(QWidget):
     """
     Widget to hold a single paint tank, valve slider and command buttons
     """
+    # time in seconds after a valve write during which polled valve values may predate it,
+    # covers one polling period of the device server and one of the background worker
+    VALVE_CACHE_DELAY = 1.0
 
-    def __init__(self, station_name, tank_name, width, setLevel, fill_button=False, flush_button=False):
+    def __init__(self, station_name, tank_name, width, station_worker, station_writer, fill_button=False,
+                 flush_button=False):
         super().__init__()
         self.station_name = station_name
         self.tank_name = tank_name
         self.setGeometry(0, 0, width, 400)
         self.setMinimumSize(width, 400)
         self.layout = QVBoxLayout()
-        self.threadpool = QThreadPool()
-        self.worker = TangoBackgroundWorker(self.station_name, self.tank_name)
-        self.worker.level.done.connect(lambda level : setLevel(level, self.tank_name))
-        self.worker.flow.done.connect(self.setFlow)
-        self.worker.color.done.connect(self.setColor)
-        self.worker.valve.done.connect(self.setValve)
-        
+        # the background worker and writer are shared by all tanks of the station
+        self.worker = station_worker
+        self.writer = station_writer
+        self.writer.written.connect(self.on_written)
+
+        # Fill/Flush buttons, only enabled while the station is connected
+        self.command_buttons = []
 
         if fill_button:
             button = QPushButton('Fill', self)
             button.setToolTip('Fill up the tank with paint')
             button.clicked.connect(self.on_fill)
+            self.command_buttons.append(button)
             self.layout.addWidget(button)
 
         # label for level
@@ -141,6 +199,10 @@ class PaintTankWidget(QWidget):
         self.slider.setSingleStep(10)
         self.slider.setTickInterval(20)
         self.timer_slider = None
+        # last valve value written to or read from the device, used to skip redundant writes
+        self.last_valve = None
+        # time of the last valve write, polled valve values are ignored shortly after it
+        self.valve_written_time = None
         self.slider.valueChanged[int].connect(self.changedValue)
         self.layout.addWidget(self.slider)
 
@@ -148,15 +210,12 @@ class PaintTankWidget(QWidget):
             button = QPushButton('Flush', self)
             button.setToolTip('Flush the tank')
             button.clicked.connect(self.on_flush)
+            self.command_buttons.append(button)
             self.layout.addWidget(button)
 
         self.setLayout(self.layout)
 
-        # set the valve attribute to fully closed
-        worker = TangoWriteAttributeWorker(self.station_name, self.tank_name, TANGO_ATTRIBUTE_VALVE, self.slider.value() / 100.0)
-        self.threadpool.start(worker)
-        self.worker.start()
-        # update the UI element
+        # update the UI element, the valve attribute is closed by the station
         self.tank.setValve(0)
 
     def changedValue(self):
@@ -176,22 +235,54 @@ class PaintTankWidget(QWidget):
         self.timer_slider = None
 
         # set valve attribute
-        worker = TangoWriteAttributeWorker(self.station_name, self.tank_name, TANGO_ATTRIBUTE_VALVE, self.slider.value() / 100.0)
-        worker.signal.done.connect(self.setValve)
-        self.threadpool.start(worker)
+        self.writeValve(self.slider.value() / 100.0)
+
+    def writeValve(self, valve):
+        """
+        write the valve attribute in the background, unless it already has the given value
+        """
+        if valve == self.last_valve:
+            return
+        self.last_valve = valve
+        self.valve_written_time = time.monotonic()
+        self.writer.write(self.tank_name, TANGO_ATTRIBUTE_VALVE, valve)
+
+    def on_written(self, tank_name, attribute, value):
+        """
+        callback when the background writer has written an attribute of a tank of the station
+        """
+        if tank_name == self.tank_name and attribute == TANGO_ATTRIBUTE_VALVE:
+            self.valve_written_time = time.monotonic()
+            self.setValve(value)
+
+    def on_update(self, values):
+        """
+        update all UI elements of the tank with new attribute values read by the background worker
+        """
+        self.setColor(values[TANGO_ATTRIBUTE_COLOR])
+        self.setLevel(values[TANGO_ATTRIBUTE_LEVEL])
+        self.setFlow(values[TANGO_ATTRIBUTE_FLOW])
+        # the polling cache of the device server may still hold the valve value from before the last write
+        if self.valve_written_time is None or time.monotonic() - self.valve_written_time > self.VALVE_CACHE_DELAY:
+            self.setValve(values[TANGO_ATTRIBUTE_VALVE])
+        # repaint the tank once for all changes
+        self.tank.update()
 
     def setLevel(self, level):
         """
         set the level of the paint tank, range: 0-1
         """
         self.tank.fill_level = level
-        self.label_level.setText("Level: %.1f %%" % (level * 100))
-        self.tank.update()
+        # only update the label when the displayed level has changed
+        text = "Level: %.1f %%" % (level * 100)
+        if self.label_level.text() != text:
+            self.label_level.setText(text)
 
     def setValve(self, valve):
         """
         set the value of the valve label
         """
+        self.last_valve = valve
         if self.timer_slider is None and not self.slider.isSliderDown():
             # user is not currently changing the slider
             self.slider.setValue(int(valve*100))
@@ -209,23 +300,31 @@ class PaintTankWidget(QWidget):
         """
         self.tank.setColor(color)
 
+    def setConnected(self, connected):
+        """
+        enable the command buttons only while the station is connected to its Tango devices
+        """
+        for button in self.command_buttons:
+            button.setEnabled(connected)
+
     def on_fill(self):
         """
         callback method for the "Fill" button
         """
-        worker = TangoRunCommandWorker(self.station_name, self.tank_name, TANGO_COMMAND_FILL)
-        self.threadpool.start(worker)
+        self.worker.run_command(self.tank_name, TANGO_COMMAND_FILL)
 
     def on_flush(self):
         """
         callback method for the "Flush" button
         """
-        worker = TangoRunCommandWorker(self.station_name, self.tank_name, TANGO_COMMAND_FLUSH)
-        self.threadpool.start(worker)
+        self.worker.run_command(self.tank_name, TANGO_COMMAND_FLUSH)
 
 
 class ColorMixingStationWidget(QWidget):
-    def __init__(self, station_name, setLevel):
+    # minimum interval between two UI updates in milliseconds
+    UPDATE_INTERVAL = 50
+
+    def __init__(self, station_name, setLevel, setConnected):
         super().__init__()
         self.station_name = station_name
 
@@ -241,27 +340,100 @@ class ColorMixingStationWidget(QWidget):
         detailled_view_label.setAlignment(Qt.AlignCenter)
         vbox.addWidget(detailled_view_label)
 
-        self.tanks = {"cyan": PaintTankWidget(self.station_name, "cyan", width=150, setLevel=setLevel, fill_button=True),
-                      "magenta": PaintTankWidget(self.station_name, "magenta", width=150, setLevel=setLevel, fill_button=True),
-                      "yellow": PaintTankWidget(self.station_name, "yellow", width=150, setLevel=setLevel, fill_button=True),
-                      "black": PaintTankWidget(self.station_name, "black", width=150, setLevel=setLevel, fill_button=True),
-                      "white": PaintTankWidget(self.station_name, "white", width=150, setLevel=setLevel, fill_button=True),
-                      "mixer": PaintTankWidget(self.station_name, "mixer", width=860, setLevel=setLevel, flush_button=True)}
+        # one background worker and writer shared by all tanks of the station
+        self.worker = StationBackgroundWorker(self.station_name)
+        self.writer = StationWriteWorker(self.station_name, self.worker.is_connected)
+        self.setOverviewLevel = setLevel
 
-        hbox.addWidget(self.tanks["cyan"])
-        hbox.addWidget(self.tanks["magenta"])
-        hbox.addWidget(self.tanks["yellow"])
-        hbox.addWidget(self.tanks["black"])
-        hbox.addWidget(self.tanks["white"])
+        # the tank widgets are only built when the station is shown for the first time
+        self.tanks = {}
+        # latest values per tank applied to the UI
+        self.values = {}
+        # whether the background worker is connected to the devices of the station
+        self.is_connected = False
 
+        self.hbox = hbox
         vbox.addLayout(hbox)
 
-        vbox.addWidget(self.tanks["mixer"])
-
         self.layout = vbox
 
         self.setLayout(self.layout)
 
+        # set the valve attributes to fully closed
+        for tank_name in TANK_NAMES:
+            self.writer.write(tank_name, TANGO_ATTRIBUTE_VALVE, 0.0)
+
+        # latest values per tank that have not been applied to the UI yet
+        self.pending_values = {}
+        self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
+        self.update_timer.setInterval(self.UPDATE_INTERVAL)
+        self.update_timer.timeout.connect(self.flush_updates)
+
+        self.worker.updated.connect(self.on_update)
+        self.worker.connected.connect(setConnected)
+        self.worker.connected.connect(self.on_connected)
+        self.worker.start()
+        self.writer.start()
+
+    def stop(self):
+        """
+        request the background worker and writer of the station to stop
+        """
+        self.worker.stop()
+        self.writer.stop()
+
+    def ensure_built(self):
+        """
+        build the tank widgets of the station, unless they already exist
+        """
+        if self.tanks:
+            return
+        for tank_name, spec in TANK_SPECS.items():
+            self.tanks[tank_name] = PaintTankWidget(self.station_name, tank_name, station_worker=self.worker,
+                                                    station_writer=self.writer, **spec)
+            self.tanks[tank_name].setConnected(self.is_connected)
+            if tank_name in self.values:
+                self.tanks[tank_name].on_update(self.values[tank_name])
+            if tank_name == "mixer":
+                self.layout.addWidget(self.tanks[tank_name])
+            else:
+                self.hbox.addWidget(self.tanks[tank_name])
+
+    def on_connected(self, connected):
+        """
+        callback when the background worker has connected to or lost the devices of the station
+        """
+        self.is_connected = connected
+        for tank in self.tanks.values():
+            tank.setConnected(connected)
+
+    def showEvent(self, event):
+        """
+        callback when the widget is shown
+        """
+        self.ensure_built()
+        super().showEvent(event)
+
+    def on_update(self, values):
+        """
+        callback when the background worker has read new attribute values for the tanks of the station,
+        the values are applied to the UI by the next flush, older values not yet applied are discarded
+        """
+        if not self.pending_values:
+            self.update_timer.start()
+        self.pending_values.update(values)
+
+    def flush_updates(self):
+        """
+        apply the latest pending values to the UI
+        """
+        for tank_name in list(self.pending_values):
+            values = self.values[tank_name] = self.pending_values.pop(tank_name)
+            self.setOverviewLevel(values[TANGO_ATTRIBUTE_LEVEL], tank_name)
+            if tank_name in self.tanks:
+                self.tanks[tank_name].on_update(values)
+
 
 class ColorMixingStationOverviewWidget(QWidget):
     def __init__(self, station_name, wrt_alarm):
@@ -274,17 +446,21 @@ class ColorMixingStationOverviewWidget(QWidget):
         self.layout = QVBoxLayout()
 
         # add station label to station overview
-        self.label_station_name = QLabel(f'Station {self.station_name[-1]}')
+        self.label_station_name = QLabel(f'Station {self.station_name[-1]} (connecting...)')
         self.label_station_name.setAlignment(Qt.AlignCenter)
         self.layout.addWidget(self.label_station_name)
 
         # link station overview with its detailled one
-        self.station = ColorMixingStationWidget(self.station_name, self.setLevel)
+        self.station = ColorMixingStationWidget(self.station_name, self.setLevel, self.setConnected)
 
         # add 6 tank level indicator with tank names
         level_vbox = QVBoxLayout()
 
-        self.tank_labels = {tank_name : (QLabel(tank_name), QLabel('--')) for tank_name in self.station.tanks.keys()}
+        # last level per tank, used to detect alarms
+        self.levels = {tank_name: 0 for tank_name in TANK_NAMES}
+        self.tank_labels = {tank_name : (QLabel(tank_name), QLabel('--')) for tank_name in TANK_NAMES}
+        # current style sheet per tank level label
+        self.label_styles = {tank_name: LABEL_STYLE_NONE for tank_name in TANK_NAMES}
         for tank_label in self.tank_labels.values():
             level_hbox = QHBoxLayout()
             tank_label[0].setAlignment(Qt.AlignCenter)
@@ -298,17 +474,33 @@ class ColorMixingStationOverviewWidget(QWidget):
         
         self.setLayout(self.layout)
 
+    def setConnected(self, connected):
+        """
+        show whether the station is connected to its Tango devices
+        """
+        if connected:
+            self.label_station_name.setText(f'Station {self.station_name[-1]}')
+        else:
+            self.label_station_name.setText(f'Station {self.station_name[-1]} (connecting...)')
+
     def setLevel(self, level, tank_name):
         """
         set the level of the paint tank, range: 0-1
         """
-        self.check_alarm_generation(self.station.tanks[tank_name].tank.fill_level, level, tank_name)
-        self.station.tanks[tank_name].tank.fill_level = level
-        self.station.tanks[tank_name].label_level.setText("Level: %.1f %%" % (level * 100))
-        self.tank_labels[tank_name][1].setText('%.1f %%' % (level*100))
+        self.check_alarm_generation(self.levels[tank_name], level, tank_name)
+        self.levels[tank_name] = level
 
-        self.tank_labels[tank_name][1].setStyleSheet("background-color: "+self.get_label_color(tank_name, level))
-        self.station.tanks[tank_name].tank.update()  
+        # only update the label when the displayed level has changed
+        text = '%.1f %%' % (level*100)
+        label = self.tank_labels[tank_name][1]
+        if label.text() != text:
+            label.setText(text)
+
+        # only restyle the label when its color has changed
+        style = self.get_label_style(tank_name, level)
+        if style != self.label_styles[tank_name]:
+            self.label_styles[tank_name] = style
+            label.setStyleSheet(style)
 
     def check_alarm_generation(self, previous_level, level, tank_name):
         if tank_name == 'mixer':
@@ -322,24 +514,24 @@ class ColorMixingStationOverviewWidget(QWidget):
             elif previous_level>0.1 and level<=0.1:
                 self.wrt_alarm(f'{self.station_name}/{tank_name}',f'{np.round(level*10)/10:.0%} remaining','high','close valve or fill tank')
 
-    def get_label_color(self, tank_name, level):
+    def get_label_style(self, tank_name, level):
         """
-        get the color to raise concern on soon empty or full tanks
+        get the style sheet to raise concern on soon empty or full tanks
         """
         if tank_name == 'mixer':
             if level>=0.9:
-                return f'rgba(255, 0, 0, 1)' # red
+                return LABEL_STYLE_ALARM
             elif level>=0.8:
-                return f'rgba(255, 165, 0, 1)' # orange
+                return LABEL_STYLE_WARNING
             else:
-                return 'none'
+                return LABEL_STYLE_NONE
         else:
             if level<=0.1:
-                return f'rgba(255, 0, 0, 1)' # red
+                return LABEL_STYLE_ALARM
             elif level<=0.2:
-                return f'rgba(255, 165, 0, 1)' # orange
+                return LABEL_STYLE_WARNING
             else:
-                return 'none'
+                return LABEL_STYLE_NONE
 
 
 class PlantOverviewWidget(QWidget):
@@ -389,38 +581,13 @@ class Gui(QMainWindow):
         
         # add inspect buttons
         button_layout = QHBoxLayout()
-        # for i in range(1,7):
-        #     button = QPushButton(f'Inspect {i}', self)
-        #     button.setToolTip(f'Inspect station {i}')
-        #     button.clicked.connect(lambda: self.on_inspect(i-1))
-        #     button_layout.addWidget(button)
-
-        button1 = QPushButton(f'Inspect {1}', self)
-        button1.clicked.connect(lambda x: self.on_inspect(0))
-        button1.setToolTip(f'Inspect station {1}')
-        button2 = QPushButton(f'Inspect {2}', self)
-        button2.clicked.connect(lambda x: self.on_inspect(1))
-        button2.setToolTip(f'Inspect station {2}')
-        button3 = QPushButton(f'Inspect {3}', self)
-        button3.clicked.connect(lambda x: self.on_inspect(2))
-        button3.setToolTip(f'Inspect station {3}')
-        button4 = QPushButton(f'Inspect {4}', self)
-        button4.clicked.connect(lambda x: self.on_inspect(3))
-        button4.setToolTip(f'Inspect station {4}')
-        button5 = QPushButton(f'Inspect {5}', self)
-        button5.clicked.connect(lambda x: self.on_inspect(4))
-        button5.setToolTip(f'Inspect station {5}')
-        button6 = QPushButton(f'Inspect {6}', self)
-        button6.clicked.connect(lambda x: self.on_inspect(5))
-        button6.setToolTip(f'Inspect station {6}')
-
-        button_layout.addWidget(button1)
-        button_layout.addWidget(button2)
-        button_layout.addWidget(button3)
-        button_layout.addWidget(button4)
-        button_layout.addWidget(button5)
-        button_layout.addWidget(button6)
-        
+        for i in range(6):
+            button = QPushButton(f'Inspect {i+1}', self)
+            button.setToolTip(f'Inspect station {i+1}')
+            # bind the station index now, a lambda would only see the last value of i
+            button.clicked.connect(partial(self.on_inspect, i))
+            button_layout.addWidget(button)
+
         self.upleft_panel.addLayout(button_layout)
         self.up.addLayout(self.upleft_panel)
 
@@ -450,6 +617,8 @@ class Gui(QMainWindow):
         alarm_label.setAlignment(Qt.AlignCenter)
         self.down.addWidget(alarm_label)
         self.alarms = [[QLabel('') for _ in range(11)] for _ in range(5)]
+        # ring buffer with the texts of the latest alarms, most recent first
+        self.alarm_texts = deque(maxlen=10)
         for j,col_text in enumerate(['Priority','Timestamp','Station/Tank','Description','Remedial action']):
             self.alarms[j][0].setText(col_text)
         alarm_labels_layout = QHBoxLayout()
@@ -465,154 +634,299 @@ class Gui(QMainWindow):
 
         self.window.setLayout(self.layout)
 
-    def on_inspect(self, station_i):
+    def closeEvent(self, event):
+        """
+        callback when the main window is closed, stops all background threads
+        """
+        stations = [station_overview.station for station_overview in self.plant_overview.station_overviews]
+        for station in stations:
+            station.stop()
+        # all waits in the threads are interrupted by stop(), only a Tango request that is already running
+        # delays them, at most until its timeout. The threads must have finished before they are destroyed.
+        for station in stations:
+            station.worker.wait()
+            station.writer.wait()
+        super().closeEvent(event)
+
+    def on_inspect(self, station_i, checked=False):
+        self.plant_overview.station_overviews[station_i].station.ensure_built()
         self.detailled_view.setCurrentIndex(station_i)
 
     def write_new_alarm(self, station_tank_name, alarm_text, priority, action):
-        now = time.localtime()
-        timestamp = f'{now.tm_mday:02}/{now.tm_mon:02}/{now.tm_year} {now.tm_hour:02}:{now.tm_min:02}:{now.tm_sec:02}'
-        alarm_labels = [priority.capitalize(), timestamp, station_tank_name, alarm_text, action.capitalize()]
-        
-        for j in range(5):
-            for i in reversed(range(2,len(self.alarms[j]))):
-                self.alarms[j][i].setText(self.alarms[j][i-1].text())
+        timestamp = time.strftime('%d/%m/%Y %H:%M:%S')
+        self.alarm_texts.appendleft([priority.capitalize(), timestamp, station_tank_name, alarm_text, action.capitalize()])
 
-        for j in range(5):
-            self.alarms[j][1].setText(alarm_labels[j])
+        # only update the labels whose text has changed
+        for i, alarm_labels in enumerate(self.alarm_texts, start=1):
+            for j, text in enumerate(alarm_labels):
+                if self.alarms[j][i].text() != text:
+                    self.alarms[j][i].setText(text)
 
 
-class WorkerSignal(QObject):
+class ProxyRegistry:
     """
-    Implementation of a QT signal
+    Process-wide registry of the Tango device proxies by device name.
+    The proxies are created and registered by the background workers, so that the UI thread never has to wait for
+    a proxy to be created.
     """
-    done = pyqtSignal(object)
-
 
-class TangoWriteAttributeWorker(QRunnable):
-    """
-    Worker class to write to a Tango attribute in the background.
-    This is used to avoid blocking the main UI thread.
-    """
+    def __init__(self):
+        self.proxies = {}
+        self.lock = Lock()
 
-    def __init__(self, station_name, device, attribute, value):
-        super().__init__()
-        self.signal = WorkerSignal()
-        self.path = "%s/%s/%s/%s" % (TANGO_NAME_PREFIX, station_name, device, attribute)
-        self.value = value
+    def put(self, name, proxy):
+        """
+        register the proxy for the given device name
+        """
+        with self.lock:
+            self.proxies[name] = proxy
 
-    @pyqtSlot()
-    def run(self):
+    def get(self, name):
         """
-        main method of the worker
+        get the proxy for the given device name, returns None if it has not been registered yet
         """
-        print("setDeviceAttribute: %s = %f" % (self.path, self.value))
-        attr = AttributeProxy(self.path)
-        try:
-            # write attribute
-            attr.write(self.value)
-            # read back attribute
-            data = attr.read()
-            # send callback signal to UI
-            self.signal.done.emit(data.value)
-        except Exception as e:
-            print("Failed to write to the Attribute: %s. Is the Device Server running?" % self.path)
+        with self.lock:
+            return self.proxies.get(name)
+
 
+proxy_registry = ProxyRegistry()
 
-class TangoRunCommandWorker(QRunnable):
+
+class StationWriteWorker(QThread):
     """
-    Worker class to call a Tango command in the background.
-    This is used to avoid blocking the main UI thread.
+    Worker class to write to the Tango attributes of the tanks of a station in the background.
+    This is used to avoid blocking the main UI thread. Writes that are queued while the worker is busy are
+    coalesced, only the latest value of each attribute is written. Writes are held back while the station is not
+    connected.
     """
+    written = pyqtSignal(str, str, object)
+    # interval in seconds to check for a stop request while waiting for the station to be connected
+    STOP_CHECK_INTERVAL = 0.1
 
-    def __init__(self, station_name, device, command, *args):
+    def __init__(self, station_name, station_connected):
         """
-        creates a new instance for the given device instance and command
-        :param device: device name
-        :param command: name of the command
-        :param args: command arguments
+        creates a new instance
+        :param station_name: station name
+        :param station_connected: event that is set while the devices of the station are connected
         """
         super().__init__()
-        self.signal = WorkerSignal()
-        self.device = "%s/%s/%s" % (TANGO_NAME_PREFIX, station_name, device)
-        self.command = command
-        self.args = args
+        self.station_name = station_name
+        self.station_connected = station_connected
+        self.device_names = get_device_names(station_name)
+        self.queue = Queue()
+        self.stop_event = Event()
+
+    def write(self, tank_name, attribute, value):
+        """
+        queue a value to be written to the attribute of the given tank
+        """
+        self.queue.put((tank_name, attribute, value))
+
+    def stop(self):
+        """
+        request the worker to stop, pending writes are dropped
+        """
+        self.stop_event.set()
+        self.queue.put(None)
 
-    @pyqtSlot()
     def run(self):
         """
         main method of the worker
         """
-        print("device: %s command: %s args: %s" % (self.device, self.command, self.args))
-        try:
-            device = DeviceProxy(self.device)
-            # get device server method
-            func = getattr(device, self.command)
-            # call command
-            result = func(*self.args)
-            # send callback signal to UI
-            self.signal.done.emit(result)
-        except Exception as e:
-            print("Error calling device server command: device: %s command: %s" % (self.device, self.command))
-
-
-class TangoBackgroundWorker(QThread):
+        while not self.stop_event.is_set():
+            # wait for the next write
+            items = [self.queue.get()]
+            # wait for the station to be connected, writes queued meanwhile are kept
+            while not self.station_connected.wait(self.STOP_CHECK_INTERVAL):
+                if self.stop_event.is_set():
+                    return
+            # collect the latest value of all pending writes
+            while not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            pending = {}
+            for item in items:
+                if item is not None:
+                    tank_name, attribute, value = item
+                    pending[(tank_name, attribute)] = value
+
+            for (tank_name, attribute), value in pending.items():
+                if self.stop_event.is_set():
+                    return
+                device_name = self.device_names[tank_name]
+                log.debug("setDeviceAttribute: %s/%s = %f", device_name, attribute, value)
+                device = proxy_registry.get(device_name)
+                if device is None:
+                    log.error("Failed to write to the Attribute: %s/%s. Device is not connected.",
+                              device_name, attribute)
+                    continue
+                try:
+                    # write attribute and read it back from the device in one request
+                    data = device.write_read_attribute(attribute, value)
+                    # send callback signal to UI
+                    self.written.emit(tank_name, attribute, data.value)
+                except Exception:
+                    log.error("Failed to write to the Attribute: %s/%s. Is the Device Server running?",
+                              device_name, attribute)
+
+
+class StationBackgroundWorker(QThread):
     """
-    This worker runs in the background and polls certain Tango device attributes (e.g. level, flow, color).
-    It will signal to the UI when new data is available.
+    This worker runs in the background and polls certain Tango device attributes (e.g. level, flow, color) of all
+    tanks of a station with a single grouped request.
+    It will signal to the UI when new data is available. It also collects the replies of the commands called
+    asynchronously on the tanks.
     """
+    updated = pyqtSignal(dict)
+    connected = pyqtSignal(bool)
+    # delays in seconds between two attempts to connect to the devices
+    RETRY_DELAYS = (0.5, 1, 2, 4, 8)
 
-    def __init__(self, station_name, tank_name, interval=0.5):
+    def __init__(self, station_name, interval=0.5):
         """
         creates a new instance
-        :param name: device name
+        :param station_name: station name
         :param interval: polling interval in seconds
         """
         super().__init__()
         self.station_name = station_name
-        self.tank_name = tank_name
+        self.device_names = get_device_names(station_name)
         self.interval = interval
-        self.level = WorkerSignal()
-        self.flow = WorkerSignal()
-        self.color = WorkerSignal()
-        self.valve = WorkerSignal()
+        self.stop_event = Event()
+        # set while the last grouped read succeeded
+        self.is_connected = Event()
+        # commands called asynchronously whose replies have not been collected yet
+        self.command_requests = Queue()
 
-    def run(self):
+    def stop(self):
         """
-        main method of the worker
+        request the worker to stop
         """
-        print("Starting TangoBackgroundWorker for '%s'/'%s' tank" % (self.station_name,self.tank_name))
-        # define attributes
-        try:
-            level = AttributeProxy("%s/%s/%s/%s" % (TANGO_NAME_PREFIX, self.station_name, self.tank_name, TANGO_ATTRIBUTE_LEVEL))
-            flow = AttributeProxy("%s/%s/%s/%s" % (TANGO_NAME_PREFIX, self.station_name, self.tank_name, TANGO_ATTRIBUTE_FLOW))
-            color = AttributeProxy("%s/%s/%s/%s" % (TANGO_NAME_PREFIX, self.station_name, self.tank_name, TANGO_ATTRIBUTE_COLOR))
-            valve = AttributeProxy("%s/%s/%s/%s" % (TANGO_NAME_PREFIX, self.station_name, self.tank_name, TANGO_ATTRIBUTE_VALVE))
-        except Exception as e:
-            print("Error creating AttributeProxy for %s" % self.tank_name)
+        self.stop_event.set()
+
+    def run_command(self, tank_name, command):
+        """
+        call a command of the given tank without waiting for its reply,
+        the reply is collected by the next polling round
+        """
+        device_name = self.device_names[tank_name]
+        log.debug("device: %s command: %s", device_name, command)
+        device = proxy_registry.get(device_name)
+        if device is None:
+            log.warning("Device %s is not connected yet, command %s ignored", device_name, command)
             return
+        try:
+            request_id = device.command_inout_asynch(command)
+            self.command_requests.put((device, request_id, command))
+        except Exception:
+            log.exception("Error calling device server command: device: %s command: %s", device_name, command)
+
+    def collect_command_replies(self):
+        """
+        collect the replies of the commands called asynchronously that have arrived, errors are logged
+        """
+        pending = []
+        while not self.command_requests.empty():
+            device, request_id, command = self.command_requests.get_nowait()
+            try:
+                device.command_inout_reply(request_id)
+            except AsynReplyNotArrived:
+                pending.append((device, request_id, command))
+            except Exception:
+                log.exception("Error calling device server command: device: %s command: %s", device.name(), command)
+        for request in pending:
+            self.command_requests.put(request)
+
+    def connect(self):
+        """
+        create the group of all tank devices of the station and register the device proxies,
+        retries with exponentially increasing delays until it succeeds, returns None when stopped while waiting
+        """
+        device_names = list(self.device_names.values())
+        attempt = 0
+        while True:
+            try:
+                group = Group(self.station_name)
+                group.add(device_names)
+                for device_name in device_names:
+                    device = group.get_device(device_name)
+                    # read attributes from the polling cache of the device server
+                    device.set_source(DevSource.CACHE_DEV)
+                    proxy_registry.put(device_name, device)
+                return group
+            except Exception:
+                delay = self.RETRY_DELAYS[min(attempt, len(self.RETRY_DELAYS) - 1)]
+                log.exception("Error creating Group for %s, retrying in %.1f s", self.station_name, delay)
+                if self.stop_event.wait(delay):
+                    return None
+                attempt += 1
 
+    def run(self):
+        """
+        main method of the worker
+        """
+        log.info("Starting StationBackgroundWorker for '%s'", self.station_name)
+        group = None
+        # number of failed rounds since the last grouped read succeeded
+        failures = 0
+        attributes = [TANGO_ATTRIBUTE_COLOR, TANGO_ATTRIBUTE_LEVEL, TANGO_ATTRIBUTE_FLOW, TANGO_ATTRIBUTE_VALVE]
         while True:
+            if group is None:
+                group = self.connect()
+                if group is None:
+                    return
             try:
-                # read attributes
-                data_color = color.read()
-                data_level = level.read()
-                data_flow = flow.read()
-                data_valve = valve.read()
-                # signal to UI
-                self.color.done.emit(data_color.value)
-                self.level.done.emit(data_level.value)
-                self.flow.done.emit(data_flow.value)
-                self.valve.done.emit(data_valve.value)
-            except Exception as e:
-                print("Error reading from the device: %s" % e)
+                # read all attributes of all tanks in one grouped request
+                replies = group.read_attributes(attributes)
+                values = {}
+                failed = []
+                for reply in replies:
+                    if reply.has_failed():
+                        failed.append(reply)
+                        continue
+                    tank_name = reply.dev_name().split('/')[-1]
+                    values.setdefault(tank_name, {})[reply.obj_name()] = reply.get_data().value
+                if failed and len(failed) == len(replies):
+                    # no device of the station has answered, e.g. because the device server is down
+                    log.error("Error reading from the devices of %s: %s", self.station_name, failed[0].get_err_stack())
+                    group = None
+                else:
+                    if failed:
+                        log.warning("Error reading %d attributes of %s, first failed: %s/%s: %s", len(failed),
+                                    self.station_name, failed[0].dev_name(), failed[0].obj_name(),
+                                    failed[0].get_err_stack())
+                    # signal all tanks with a complete set of values to UI at once
+                    self.updated.emit({tank_name: tank_values for tank_name, tank_values in values.items()
+                                       if len(tank_values) == len(attributes)})
+            except Exception:
+                log.exception("Error reading from the devices of %s", self.station_name)
+                group = None
+
+            if group is None:
+                # reconnect in the next round, after an increasing delay
+                if self.is_connected.is_set():
+                    self.is_connected.clear()
+                    self.connected.emit(False)
+                delay = self.RETRY_DELAYS[min(failures, len(self.RETRY_DELAYS) - 1)]
+                failures += 1
+            else:
+                if not self.is_connected.is_set():
+                    self.is_connected.set()
+                    self.connected.emit(True)
+                failures = 0
+                delay = self.interval
+
+            self.collect_command_replies()
 
             # wait for next round
-            time.sleep(self.interval)
+            if self.stop_event.wait(delay):
+                return
 
 
 if __name__ == '__main__':
     # register signal handler for CTRL-C events
     signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # log messages of the background workers, use level DEBUG to also log every write and command
+    logging.basicConfig(level=logging.INFO)
 
     # init the QT application and the main window
     app = QApplication(sys.argv)
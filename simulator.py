@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from threading import Thread
+from threading import Lock, Thread
 import time
 
 import mixbox
@@ -103,25 +103,30 @@ class PaintTank:
         self.paint = self.initial_paint
         self.valve_ratio = 0  # valve closed
         self.outflow = 0
+        # protects the paint and outflow, which are changed by the simulation thread
+        self.lock = Lock()
 
     def add(self, inflow):
         """
         Add paint to the tank
         :param inflow: paint to add
         """
-        self.paint += inflow
+        with self.lock:
+            self.paint += inflow
 
     def fill(self, level=1.0):
         """
         fill up the tank based on the specified initial paint mixture
         """
-        self.paint = self.initial_paint * (level * self.tank_volume / self.initial_paint.volume)
+        with self.lock:
+            self.paint = self.initial_paint * (level * self.tank_volume / self.initial_paint.volume)
 
     def flush(self):
         """
         flush the tank
         """
-        self.paint = PaintMixture()
+        with self.lock:
+            self.paint = PaintMixture()
 
     def get_level(self):
         """
@@ -169,32 +174,43 @@ class PaintTank:
         rgb = mixbox.latent_to_rgb(z_mix)
         return "#%02x%02x%02x" % (rgb[0], rgb[1], rgb[2])
 
+    def snapshot(self, names=('level', 'flow', 'color', 'valve')):
+        """
+        get the current values of the given attributes of the tank at once, consistent with each other
+        :param names: names of the attributes, any of 'level', 'flow', 'color' and 'valve', others are ignored
+        """
+        getters = {'level': self.get_level, 'flow': self.get_outflow, 'color': self.get_color_rgb,
+                   'valve': self.get_valve}
+        with self.lock:
+            return {name: getters[name]() for name in names if name in getters}
+
     def simulate_timestep(self, interval):
         """
         update the simulation based on the specified time interval
         """
-        # calculate the volume of the paint flowing out in the current time interval
-        outgoing_volume = self.valve_ratio * self.outflow_rate * interval
-        if outgoing_volume >= self.paint.volume:
-            # tank will be empty within the current time interval
-            out = self.paint
-            self.paint = PaintMixture()  # empty
-        else:
-            # tank will not be empty
-            out = self.paint * (outgoing_volume / self.paint.volume)
-            self.paint -= out
-
-        # set outgoing paint volume
-        self.outflow = out.volume
-
-        if self.connected_to is not None:
-            # add outgoing paint into the connected tank
-            self.connected_to.add(out)
-
-        # check if tank has overflown
-        if self.paint.volume > self.tank_volume:
-            # keep it at the maximum fill level
-            self.paint *= self.tank_volume / self.paint.volume
+        with self.lock:
+            # calculate the volume of the paint flowing out in the current time interval
+            outgoing_volume = self.valve_ratio * self.outflow_rate * interval
+            if outgoing_volume >= self.paint.volume:
+                # tank will be empty within the current time interval
+                out = self.paint
+                self.paint = PaintMixture()  # empty
+            else:
+                # tank will not be empty
+                out = self.paint * (outgoing_volume / self.paint.volume)
+                self.paint -= out
+
+            # set outgoing paint volume
+            self.outflow = out.volume
+
+            if self.connected_to is not None:
+                # add outgoing paint into the connected tank
+                self.connected_to.add(out)
+
+            # check if tank has overflown
+            if self.paint.volume > self.tank_volume:
+                # keep it at the maximum fill level
+                self.paint *= self.tank_volume / self.paint.volume
 
         # return outgoing paint mixture
         return out